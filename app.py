@@ -1,12 +1,18 @@
 import streamlit as st
 import sqlite3
+import contextlib
+import atexit
 import os
 import time
 import threading
+import queue
+import concurrent.futures
 import datetime
 import subprocess
 import shutil
-import re
+import functools
+import hashlib
+import json
 import pandas as pd
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -24,10 +30,14 @@ os.environ["IMAGEIO_FFMPEG_EXE"] = ffmpeg_path
 # ==========================================
 DB_FILE = "asmr_automator_v7_pro.db" 
 UPLOAD_DIR = "uploads"
+UPLOAD_INDEX_FILE = os.path.join(UPLOAD_DIR, "upload_index.json")
 OUTPUT_DIR = "outputs"
 SECRETS_FILE = "client_secrets.json"
 TOKEN_FILE = "token.json"
+DOWNLOAD_EMBED_MAX = 50 * 1024 * 1024 # tombol download membaca file utuh ke RAM -> hanya untuk output kecil
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024          # chunk resumable upload ke YouTube
+SINGLE_REQUEST_UPLOAD_MAX = 100 * 1024 * 1024  # di bawah ini upload sekali jalan (non-resumable)
 
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -39,118 +49,410 @@ st.set_page_config(page_title="ASMR Engine V7 Pro", layout="wide", page_icon="
 # ==========================================
 # DATABASE LAYER (SQLite)
 # ==========================================
+# SQL statis sebagai konstanta: teks identik tiap panggilan -> plan di-cache SQLite per koneksi
+SQL_INSERT_JOB = '''
+    INSERT INTO jobs (video_path, audio_path, crossfade_sec, duration_hours, title, description, tags, scheduled_at, scheduled_at_epoch, status_render, status_upload, watermark_mode, mute_original, progress, eta_text)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', 'idle', ?, ?, 0, 'Waiting...')
+'''
+SQL_JOBS_SUMMARY = "SELECT id, title, status_render, status_upload, scheduled_at FROM jobs ORDER BY id DESC"
+SQL_JOB_PROGRESS = "SELECT progress, eta_text, status_render, status_upload FROM jobs WHERE id = ?"
+SQL_JOB_DETAIL = (
+    "SELECT id, video_path, audio_path, crossfade_sec, duration_hours, title, description, tags, "
+    "scheduled_at, status_render, status_upload, youtube_id, output_path, watermark_mode, mute_original, "
+    "progress, eta_text FROM jobs WHERE id = ?"
+)
+LOG_KEEP_LINES = 500 # ring buffer: baris log terbaru yang disimpan per job
+SQL_INSERT_LOG = "INSERT INTO job_logs (job_id, ts, msg) VALUES (?, ?, ?)"
+SQL_PRUNE_LOGS = (
+    "DELETE FROM job_logs WHERE job_id = ? AND rowid NOT IN "
+    "(SELECT rowid FROM job_logs WHERE job_id = ? ORDER BY ts DESC, rowid DESC LIMIT ?)"
+)
+SQL_JOB_LOGS = "SELECT msg FROM job_logs WHERE job_id = ? ORDER BY ts DESC, rowid DESC LIMIT ?"
+SQL_NEXT_SCHEDULED = "SELECT MIN(scheduled_at_epoch) FROM jobs WHERE status_render = 'success' AND status_upload = 'waiting_schedule'"
+SQL_READY_TO_UPLOAD = (
+    "SELECT * FROM jobs WHERE status_render = 'success' AND status_upload = 'waiting_schedule' "
+    "AND scheduled_at_epoch <= CAST(strftime('%s', 'now') AS INTEGER) ORDER BY scheduled_at_epoch LIMIT 32"
+)
+STATEMENT_CACHE_SIZE = 256 # cukup untuk semua kombinasi UPDATE dinamis dari status writer
+
+def apply_pragmas(conn):
+    """WAL + synchronous NORMAL: progress update tidak fsync tiap kali & reader tidak diblok writer"""
+    # Catatan: file sidecar -wal dan -shm dibuat di samping DB_FILE dan harus berada di filesystem
+    # lokal yang sama (WAL butuh shared memory; jangan taruh DB di network share)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA wal_autocheckpoint=1000") # checkpoint tiap ~1000 halaman agar -wal tidak membengkak
+    conn.execute("PRAGMA mmap_size=268435456") # 256 MB memory-mapped I/O untuk read
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+
+def open_db_connection(connections):
+    conn = sqlite3.connect(
+        DB_FILE, check_same_thread=False, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    apply_pragmas(conn)
+    connections.append(conn)
+    return conn
+
+READER_POOL_SIZE = 4 # koneksi reader tetap; thread ScriptRunner Streamlit berganti tiap rerun
+
+def close_db_connections(connections):
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+@st.cache_resource
+def get_db():
+    """Pool SQLite per proses: 1 writer bersama + READER_POOL_SIZE reader yang dipinjam bergantian.
+    write_lock menyerialkan SEMUA write (render, scheduler, UI) di level Python, jadi thread antre
+    di lock ini, bukan di file lock SQLite. Read tanpa lock (WAL: reader tidak diblok writer).
+    Jumlah koneksi tetap (tidak per thread), jadi semuanya cukup ditutup sekali saat interpreter exit."""
+    connections = []
+    atexit.register(close_db_connections, connections)
+    readers = queue.Queue()
+    for _ in range(READER_POOL_SIZE):
+        readers.put(open_db_connection(connections))
+    return {
+        "writer": open_db_connection(connections),
+        "write_lock": threading.Lock(),
+        "readers": readers,
+    }
+
+@contextlib.contextmanager
+def db_writer():
+    """Pinjam koneksi writer tunggal (dijaga write_lock)"""
+    db = get_db()
+    with db["write_lock"]:
+        yield db["writer"]
+
+@contextlib.contextmanager
+def db_reader():
+    """Pinjam satu koneksi reader dari pool (menunggu jika semua sedang dipakai)"""
+    readers = get_db()["readers"]
+    conn = readers.get()
+    try:
+        yield conn
+    finally:
+        readers.put(conn)
+
 def init_db():
     """Inisialisasi Database dengan kolom Progress & ETA"""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_path TEXT,
-            audio_path TEXT,
-            crossfade_sec REAL,
-            duration_hours REAL,
-            title TEXT,
-            description TEXT,
-            tags TEXT,
-            scheduled_at TIMESTAMP,
-            status_render TEXT DEFAULT 'pending',
-            status_upload TEXT DEFAULT 'idle',
-            youtube_id TEXT,
-            output_path TEXT,
-            logs TEXT DEFAULT '',
-            watermark_mode TEXT DEFAULT 'none', 
-            mute_original INTEGER DEFAULT 1,
-            progress INTEGER DEFAULT 0,
-            eta_text TEXT DEFAULT '--:--'
-        )
-    ''')
+    # Migrasi skema juga lewat write lock global supaya tidak bentrok dengan thread lain
+    with db_writer() as conn:
+        c = conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                video_path TEXT,
+                audio_path TEXT,
+                crossfade_sec REAL,
+                duration_hours REAL,
+                title TEXT,
+                description TEXT,
+                tags TEXT,
+                scheduled_at TIMESTAMP,
+                scheduled_at_epoch INTEGER,
+                status_render TEXT DEFAULT 'pending',
+                status_upload TEXT DEFAULT 'idle',
+                youtube_id TEXT,
+                output_path TEXT,
+                logs TEXT DEFAULT '',
+                watermark_mode TEXT DEFAULT 'none', 
+                mute_original INTEGER DEFAULT 1,
+                progress INTEGER DEFAULT 0,
+                eta_text TEXT DEFAULT '--:--'
+            )
+        ''')
     
-    # Migrasi otomatis untuk user lama (menambah kolom jika belum ada)
-    try:
-        c.execute("ALTER TABLE jobs ADD COLUMN progress INTEGER DEFAULT 0")
-        c.execute("ALTER TABLE jobs ADD COLUMN eta_text TEXT DEFAULT '--:--'")
-    except sqlite3.OperationalError:
-        pass # Kolom sudah ada
+        # Migrasi otomatis untuk user lama (menambah kolom jika belum ada)
+        try:
+            c.execute("ALTER TABLE jobs ADD COLUMN progress INTEGER DEFAULT 0")
+            c.execute("ALTER TABLE jobs ADD COLUMN eta_text TEXT DEFAULT '--:--'")
+        except sqlite3.OperationalError:
+            pass # Kolom sudah ada
+        try:
+            c.execute("ALTER TABLE jobs ADD COLUMN scheduled_at_epoch INTEGER")
+        except sqlite3.OperationalError:
+            pass # Kolom sudah ada
+        # Backfill job lama: scheduled_at disimpan sebagai waktu lokal, 'utc' mengubahnya ke epoch Unix
+        c.execute(
+            "UPDATE jobs SET scheduled_at_epoch = CAST(strftime('%s', scheduled_at, 'utc') AS INTEGER) "
+            "WHERE scheduled_at_epoch IS NULL AND scheduled_at IS NOT NULL"
+        )
+        
+        # Log per baris di tabel terpisah (INSERT O(1), dipangkas ke LOG_KEEP_LINES) menggantikan jobs.logs
+        c.execute("CREATE TABLE IF NOT EXISTS job_logs (job_id INTEGER, ts INTEGER, msg TEXT)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_log_job ON job_logs(job_id, ts)")
+        # Migrasi: blob jobs.logs lama dipindah utuh sebagai satu baris (ts=0 -> selalu paling awal)
+        c.execute(
+            "INSERT INTO job_logs (job_id, ts, msg) SELECT id, 0, TRIM(logs, char(10)) FROM jobs "
+            "WHERE logs IS NOT NULL AND logs != ''"
+        )
+        c.execute("UPDATE jobs SET logs = '' WHERE logs IS NOT NULL AND logs != ''")
         
-    conn.commit()
-    conn.close()
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_sched_epoch ON jobs(status_upload, scheduled_at_epoch)")
 
 def add_job(v_path, a_path, crossfade, hours, title, desc, tags, scheduled_at, watermark_mode, mute_original):
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    c = conn.cursor()
     mute_val = 1 if mute_original else 0
+    # Epoch dihitung sekali di sini; scheduler cukup membandingkan integer
+    scheduled_epoch = int(scheduled_at.timestamp())
     
-    c.execute('''
-        INSERT INTO jobs (video_path, audio_path, crossfade_sec, duration_hours, title, description, tags, scheduled_at, status_render, status_upload, watermark_mode, mute_original, progress, eta_text)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', 'idle', ?, ?, 0, 'Waiting...')
-    ''', (v_path, a_path, crossfade, hours, title, desc, tags, scheduled_at, watermark_mode, mute_val))
-    job_id = c.lastrowid
-    conn.commit()
-    conn.close()
+    with db_writer() as conn:
+        c = conn.execute(SQL_INSERT_JOB, (v_path, a_path, crossfade, hours, title, desc, tags, scheduled_at, scheduled_epoch, watermark_mode, mute_val))
+        job_id = c.lastrowid
+    notify_scheduler()
     return job_id
 
-def update_job_status(job_id, render_status=None, upload_status=None, output_path=None, log_msg=None, youtube_id=None):
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    c = conn.cursor()
+STATUS_FLUSH_INTERVAL = 1.0 # detik; update progress/log dikumpulkan lalu ditulis dalam 1 transaksi
+
+@st.cache_resource
+def get_status_queue():
+    """Antrean update status/progress + satu thread writer yang mem-flush per batch"""
+    status_queue = queue.Queue()
+    threading.Thread(target=status_writer_loop, args=(status_queue,), daemon=True).start()
+    return status_queue
+
+def merge_status_items(items):
+    """Gabungkan item antrean per job: last-write-wins per kolom, baris log urut kedatangan"""
+    pending = {}
+    for job_id, fields, log_line, _ in items:
+        entry = pending.setdefault(job_id, {"fields": {}, "logs": []})
+        entry["fields"].update(fields)
+        if log_line:
+            entry["logs"].append(log_line)
+    return pending
+
+def status_writer_loop(status_queue):
+    """Kumpulkan update lalu flush maksimal 1x per STATUS_FLUSH_INTERVAL, atau langsung saat ada transisi
+    status (ada pemanggil yang menunggu). Jika flush gagal: transisi yang ditunggu DIBATALKAN dan error-nya
+    dikirim ke pemanggil (update_job_status raise, status tidak berubah); progress/log tanpa penunggu
+    disimpan dan dicoba lagi tick berikutnya."""
+    items = []
+    deadline = None
+    while True:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            item = status_queue.get(timeout=timeout)
+            items.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + STATUS_FLUSH_INTERVAL
+            if item[3] is None and time.monotonic() < deadline:
+                continue
+        except queue.Empty:
+            pass
+        
+        # Penunggu yang sudah timeout (future dibatalkan) tidak ikut ditulis; sisanya dikunci 'running'
+        # supaya tidak bisa dibatalkan lagi selagi transaksi berjalan
+        items = [item for item in items if item[3] is None or item[3].set_running_or_notify_cancel()]
+        waiters = [item[3] for item in items if item[3] is not None]
+        try:
+            flush_status_updates(merge_status_items(items))
+        except Exception as e:
+            print(f"Status Writer Error: {e}")
+            for done in waiters:
+                done.set_exception(e)
+            items = [item for item in items if item[3] is None]
+            deadline = time.monotonic() + STATUS_FLUSH_INTERVAL if items else None
+            continue
+        for done in waiters:
+            done.set_result(None)
+        items = []
+        deadline = None
+
+def flush_status_updates(pending):
+    with db_writer() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for job_id, entry in pending.items():
+                if entry["fields"]:
+                    updates = [f"{column} = ?" for column in entry["fields"]]
+                    params = list(entry["fields"].values()) + [job_id]
+                    conn.execute(f"UPDATE jobs SET {', '.join(updates)} WHERE id = ?", tuple(params))
+                if entry["logs"]:
+                    conn.executemany(SQL_INSERT_LOG, [(job_id, ts, msg) for ts, msg in entry["logs"]])
+                    conn.execute(SQL_PRUNE_LOGS, (job_id, job_id, LOG_KEEP_LINES))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
     
-    updates = []
-    params = []
+    if any("status_render" in entry["fields"] or "status_upload" in entry["fields"] for entry in pending.values()):
+        # Status berubah -> cache tabel & detail UI langsung basi, jangan tunggu TTL
+        get_jobs_summary_df.clear()
+        get_job_detail.clear()
+    if any(entry["fields"].get("status_upload") == "waiting_schedule" for entry in pending.values()):
+        # Render selesai -> bangunkan scheduler untuk hitung ulang jadwal terdekat
+        notify_scheduler()
 
+def update_job_status(job_id, render_status=None, upload_status=None, output_path=None, log_msg=None, youtube_id=None):
+    """Antrikan update ke status_writer_loop. Transisi status menunggu sampai ter-commit (thread lain,
+    mis. scheduler, langsung bertindak berdasarkan status); log saja ikut batch berikutnya.
+    Raise error flush dari writer, atau TimeoutError jika commit belum dimulai dalam 10 detik; dalam
+    kedua kasus update tersebut tidak ditulis (tidak ada commit tertunda yang muncul belakangan)."""
+    fields = {}
     if render_status:
-        updates.append("status_render = ?")
-        params.append(render_status)
+        fields["status_render"] = render_status
     if upload_status:
-        updates.append("status_upload = ?")
-        params.append(upload_status)
+        fields["status_upload"] = upload_status
     if output_path:
-        updates.append("output_path = ?")
-        params.append(output_path)
+        fields["output_path"] = output_path
     if youtube_id:
-        updates.append("youtube_id = ?")
-        params.append(youtube_id)
+        fields["youtube_id"] = youtube_id
+
+    log_line = None
     if log_msg:
-        c.execute("SELECT logs FROM jobs WHERE id = ?", (job_id,))
-        result = c.fetchone()
-        current_log = result[0] if result else ""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        new_log = f"{current_log}\n[{timestamp}] {log_msg}"
-        updates.append("logs = ?")
-        params.append(new_log)
-
-    if updates:
-        params.append(job_id)
-        query = f"UPDATE jobs SET {', '.join(updates)} WHERE id = ?"
-        c.execute(query, tuple(params))
-        conn.commit()
-    conn.close()
+        now = datetime.datetime.now()
+        log_line = (int(now.timestamp()), f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] {log_msg}")
+
+    if not (fields or log_line):
+        return
+    if render_status or upload_status:
+        done = concurrent.futures.Future()
+        get_status_queue().put((job_id, fields, log_line, done))
+        try:
+            done.result(timeout=10)
+        except concurrent.futures.TimeoutError:
+            if done.cancel():
+                raise
+            done.result() # sudah mulai ditulis -> tunggu hasil transaksinya (commit atau error)
+    else:
+        get_status_queue().put((job_id, fields, log_line, None))
 
 def update_job_progress(job_id, progress_percent, eta_msg):
-    """Fungsi khusus untuk update bar progress secara efisien"""
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    c = conn.cursor()
-    c.execute("UPDATE jobs SET progress = ?, eta_text = ? WHERE id = ?", (progress_percent, eta_msg, job_id))
-    conn.commit()
-    conn.close()
-
-def get_jobs_df():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    df = pd.read_sql_query("SELECT * FROM jobs ORDER BY id DESC", conn)
-    conn.close()
-    return df
+    """Fungsi khusus untuk update bar progress secara efisien (ikut batch status writer)"""
+    get_status_queue().put((job_id, {"progress": progress_percent, "eta_text": eta_msg}, None, None))
+
+class ProgressReporter:
+    """Debounce update progress dari loop render/upload: tulis hanya jika persen berubah
+    DAN sudah lewat min_interval detik sejak tulisan terakhir"""
+    def __init__(self, job_id, min_interval=2.0):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.last_pct = -1
+        self.last_ts = 0.0
+
+    def due(self, pct):
+        return pct != self.last_pct and time.monotonic() - self.last_ts >= self.min_interval
+
+    def update(self, pct, eta_msg):
+        if not self.due(pct):
+            return False
+        update_job_progress(self.job_id, pct, eta_msg)
+        self.last_pct = pct
+        self.last_ts = time.monotonic()
+        return True
+
+@st.cache_data(ttl=2)
+def get_jobs_summary_df():
+    """Daftar job untuk tabel UI: hanya 5 kolom yang ditampilkan (tanpa logs/description).
+    Kolom langsung Arrow-backed (bukan object) supaya st.dataframe tidak perlu konversi ulang ke Arrow"""
+    with db_reader() as conn:
+        return pd.read_sql_query(SQL_JOBS_SUMMARY, conn, dtype_backend="pyarrow")
+
+def get_job_progress(job_id):
+    """Kolom yang dibutuhkan panel progress saja (dipoll tiap tick oleh fragment live_progress_panel)"""
+    with db_reader() as conn:
+        c = conn.cursor()
+        c.row_factory = sqlite3.Row
+        row = c.execute(SQL_JOB_PROGRESS, (job_id,)).fetchone()
+    return dict(row) if row else None
+
+@st.cache_data(ttl=1)
+def get_job_detail(job_id):
+    """Satu baris job yang sedang dipilih di UI, tanpa blob logs (lihat get_job_logs)"""
+    with db_reader() as conn:
+        c = conn.cursor()
+        c.row_factory = sqlite3.Row
+        row = c.execute(SQL_JOB_DETAIL, (job_id,)).fetchone()
+    return dict(row) if row else None
+
+@st.cache_data(ttl=1)
+def get_job_logs(job_id):
+    """LOG_KEEP_LINES baris log terbaru (urut kronologis), dibaca hanya untuk text area System Logs"""
+    with db_reader() as conn:
+        rows = conn.execute(SQL_JOB_LOGS, (job_id, LOG_KEEP_LINES)).fetchall()
+    return "\n".join(row[0] for row in reversed(rows))
+
+def get_next_scheduled_at():
+    """Epoch jadwal paling awal dari job yang sudah dirender & menunggu jadwal upload"""
+    with db_reader() as conn:
+        row = conn.execute(SQL_NEXT_SCHEDULED).fetchone()
+    return row[0] if row else None
 
 def get_ready_to_upload_jobs():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT * FROM jobs WHERE status_render = 'success' AND status_upload = 'waiting_schedule'")
-    rows = c.fetchall()
-    conn.close()
+    with db_reader() as conn:
+        c = conn.cursor()
+        c.row_factory = sqlite3.Row
+        # Perbandingan jadwal di SQL sebagai integer epoch (pakai idx_jobs_sched_epoch)
+        rows = c.execute(SQL_READY_TO_UPLOAD).fetchall()
     return [dict(row) for row in rows]
 
 # ==========================================
 # SYSTEM HELPER
 # ==========================================
+@st.cache_data(ttl=2)
+def stat_file(path):
+    """Satu os.stat per path per 2 detik (pengganti exists/getsize berulang tiap rerun), None jika tidak ada"""
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+def read_file_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def upload_fingerprint(uploaded_file):
+    """Sidik cepat file upload: hash 1 MiB pertama + ukuran file"""
+    uploaded_file.seek(0)
+    head = uploaded_file.read(1 << 20)
+    uploaded_file.seek(0)
+    return hashlib.blake2b(head + str(uploaded_file.size).encode(), digest_size=8).hexdigest()
+
+@st.cache_resource
+def get_upload_index_lock():
+    """Lock bersama semua sesi untuk read-modify-write upload_index.json"""
+    return threading.Lock()
+
+def load_upload_index():
+    """Index fingerprint -> path; file rusak/tidak terbaca dianggap kosong (akan ditulis ulang)"""
+    try:
+        with open(UPLOAD_INDEX_FILE) as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_upload_index(index):
+    """Tulis ke file sementara lalu os.replace (atomik): crash di tengah dump tidak merusak index"""
+    tmp_path = UPLOAD_INDEX_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, UPLOAD_INDEX_FILE)
+
+def save_upload(uploaded_file):
+    """Simpan file upload ke UPLOAD_DIR per blok 1 MiB (tanpa salinan bytes sebesar file di RAM).
+    Kalau file yang sama sudah pernah disimpan, path lama dipakai ulang tanpa menulis ulang."""
+    fingerprint = upload_fingerprint(uploaded_file)
+    with get_upload_index_lock():
+        index = load_upload_index()
+        
+        existing = index.get(fingerprint)
+        if existing and os.path.exists(existing) and os.path.getsize(existing) == uploaded_file.size:
+            return existing
+        
+        # Fingerprint di nama file: upload beda isi dengan nama sama tidak menimpa source job yang masih antre
+        dst = os.path.join(UPLOAD_DIR, f"{fingerprint}_{uploaded_file.name}")
+        with open(dst, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, length=1 << 20)
+        
+        index[fingerprint] = dst
+        save_upload_index(index)
+    return dst
+
 def open_local_folder(path):
     try:
         if not os.path.exists(path): return False
@@ -165,7 +467,10 @@ def open_local_folder(path):
 # ==========================================
 # YOUTUBE API LAYER
 # ==========================================
-def get_authenticated_service():
+@st.cache_resource
+def get_youtube_credentials():
+    """Kredensial OAuth di-load sekali lalu dipakai bersama semua thread upload.
+    Token yang expired di-refresh otomatis oleh transport google-auth saat request."""
     creds = None
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -179,7 +484,20 @@ def get_authenticated_service():
             creds = flow.run_local_server(port=0)
         with open(TOKEN_FILE, 'w') as token:
             token.write(creds.to_json())
-    return build('youtube', 'v3', credentials=creds)
+    return creds
+
+@st.cache_resource
+def get_youtube_clients():
+    """Penyimpanan client YouTube per thread (objek httplib2 di dalam client tidak thread-safe)"""
+    return threading.local()
+
+def get_authenticated_service():
+    """Client YouTube milik thread ini, dibangun sekali lalu dipakai ulang antar upload"""
+    clients = get_youtube_clients()
+    if not hasattr(clients, "youtube"):
+        # Discovery doc statis bawaan library; cache_discovery=False melewati lookup file-cache yang tidak terpakai
+        clients.youtube = build('youtube', 'v3', credentials=get_youtube_credentials(), cache_discovery=False)
+    return clients.youtube
 
 def upload_video_to_youtube(job_id, file_path, title, description, tags, category_id="22"):
     """Mengupload video dengan Progress Tracking"""
@@ -195,46 +513,264 @@ def upload_video_to_youtube(job_id, file_path, title, description, tags, categor
             }
         }
         
-        # Chunksize 4MB agar progress bar bergerak halus
-        chunk_size = 4 * 1024 * 1024 
-        media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
-        request = youtube.videos().insert(part=','.join(body.keys()), body=body, media_body=media)
-        
-        response = None
-        while response is None:
-            status, response = request.next_chunk()
-            if status:
-                prog = int(status.progress() * 100)
-                update_job_progress(job_id, prog, "☁️ Uploading to YouTube...")
+        if os.path.getsize(file_path) < SINGLE_REQUEST_UPLOAD_MAX:
+            # File kecil: satu request multipart, tanpa sesi resumable
+            media = MediaFileUpload(file_path, resumable=False)
+            request = youtube.videos().insert(part=','.join(body.keys()), body=body, media_body=media)
+            update_job_progress(job_id, 0, "☁️ Uploading to YouTube...")
+            response = request.execute()
+        else:
+            # Chunk besar = lebih sedikit round-trip & jeda idle TCP antar chunk
+            media = MediaFileUpload(file_path, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+            request = youtube.videos().insert(part=','.join(body.keys()), body=body, media_body=media)
+            reporter = ProgressReporter(job_id)
+            
+            response = None
+            while response is None:
+                status, response = request.next_chunk()
+                if status:
+                    reporter.update(int(status.progress() * 100), "☁️ Uploading to YouTube...")
         
         update_job_progress(job_id, 100, "✅ Upload Complete")
         return response['id']
     except Exception as e:
+        # Build ulang client (dan kredensial) di upload berikutnya, siapa tahu token dicabut
+        get_youtube_credentials.clear()
+        get_youtube_clients.clear()
         raise e
 
 # ==========================================
 # FFmpeg PROCESSING ENGINE (WITH ETA)
 # ==========================================
+@st.cache_resource
 def check_nvidia_gpu():
+    """Probe nvidia-smi sekali per proses (GPU tidak berubah selama app jalan)"""
+    # Tanpa nvidia-smi di PATH pasti tidak ada GPU NVIDIA -> tidak perlu fork sama sekali
+    if not shutil.which("nvidia-smi"):
+        return False
     try:
-        subprocess.run(["nvidia-smi"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        subprocess.run(["nvidia-smi"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=10)
         return True
-    except:
+    except Exception:
         return False
 
-def process_asmr_video(job_id, video_path, audio_path, duration_hours, watermark_mode, mute_original):
+def run_ffprobe(path, *args):
+    """Jalankan ffprobe dan kembalikan stdout (strip), None jika ffprobe tidak ada / gagal"""
+    if not shutil.which("ffprobe"):
+        return None
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", *args, "-of", "default=nw=1:nk=1", path],
+            capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip() or None
+    except Exception:
+        return None
+
+def probe_video_codec(path):
+    """Nama codec stream video pertama (mis. 'h264')"""
+    return run_ffprobe(path, "-select_streams", "v:0", "-show_entries", "stream=codec_name")
+
+def probe_duration(path):
+    """Durasi file dalam detik (float), None jika tidak diketahui"""
+    try:
+        return float(run_ffprobe(path, "-show_entries", "format=duration"))
+    except (TypeError, ValueError):
+        return None
+
+# Profil NVENC (preset, tune). NVENC modern butuh -tune & -rc eksplisit agar pakai pipeline preset p1-p7
+NVENC_PROFILES = {
+    "fast": ("p1", "ull"),
+    "balanced": ("p4", "ll"),
+    "quality": ("p7", "hq"),
+}
+NVENC_BITRATE = "8M"
+WM_LABELS = {
+    "none": "⛔ None (Original)",
+    "zoom_tl": "✨ Zoom Top-Left (Recommended)",
+    "crop_only": "✂️ Crop Bottom Only",
+    "blur": "💧 Blur Bottom"
+}
+WATERMARK_MODES = list(WM_LABELS)
+
+# ==========================================
+# FFmpeg COMMAND TEMPLATES (dibangun sekali saat import)
+# Placeholder {VIDEO}/{AUDIO}/{DUR}/{OUT} diisi saat render; {CODEC} di-splice dengan CODEC_ARGS
+# ==========================================
+def build_codec_args(gpu, encode_profile):
+    if gpu:
+        nv_preset, nv_tune = NVENC_PROFILES[encode_profile]
+        args = [
+            "-c:v", "h264_nvenc", "-preset", nv_preset, "-tune", nv_tune,
+            "-rc", "cbr", "-b:v", NVENC_BITRATE, "-g", "120",
+        ]
+        if nv_tune != "hq":
+            # Low-latency: tanpa lookahead/B-frame/multipass -> throughput maksimum
+            args.extend(["-multipass", "0", "-rc-lookahead", "0", "-bf", "0"])
+        return args
+    # zerolatency mematikan lookahead & B-frame (sliced threads); ref=1 memangkas motion search
+    return [
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+        "-threads", "0", "-x264-params", "rc-lookahead=0:bframes=0:ref=1", "-g", "120",
+    ]
+
+def build_encode_template(gpu, watermark_mode, mute_original):
+    """Tahap 1: encode source sekali (filter watermark + codec) ke file perantara"""
+    cmd = ["ffmpeg", "-y"]
+    if gpu:
+        # Decode di GPU (NVDEC). Frame tetap di VRAM sampai NVENC kalau tidak ada filter CPU;
+        # crop/delogo hanya ada versi CPU, jadi mode itu biarkan ffmpeg download frame otomatis.
+        cmd.extend(["-hwaccel", "cuda"])
+        if watermark_mode == 'none':
+            cmd.extend(["-hwaccel_output_format", "cuda"])
+    cmd.extend(["-i", "{VIDEO}"])
+    
+    # Watermark Logic
+    video_filters = []
+    if watermark_mode == 'crop_only':
+        video_filters.append("crop=in_w:in_h-86:0:0")
+    elif watermark_mode == 'blur':
+        video_filters.append("delogo=x=0:y=h-86:w=w:h=86")
+    elif watermark_mode == 'zoom_tl':
+        if gpu:
+            # Crop di CPU (murah), lalu upload sekali ke VRAM dan resize di GPU
+            video_filters.append("crop=in_w-150:in_h-86:0:0,hwupload_cuda,scale_cuda=1920:1080")
+        else:
+            # Bilinear: ~3-5x lebih ringan per piksel dibanding lanczos, beda visual minim untuk upscale kecil
+            video_filters.append("crop=in_w-150:in_h-86:0:0,scale=1920:1080:flags=bilinear")
+
+    if video_filters:
+        cmd.extend(["-vf", ",".join(video_filters)])
+    
+    cmd.extend(["-map", "0:v:0", "{CODEC}"])
+    if mute_original:
+        cmd.append("-an")
+    else:
+        # Audio asli ikut disimpan, nanti di-mix dengan track audio di tahap 2
+        cmd.extend(["-map", "0:a:0", "-c:a", "aac", "-b:a", "192k"])
+    cmd.append("{OUT}")
+    return cmd
+
+def build_loop_template(mute_original):
+    """Tahap 2: loop video (stream copy) + audio sampai durasi target"""
+    cmd = ["ffmpeg", "-y"]
+    cmd.extend(["-stream_loop", "-1", "-i", "{VIDEO}"])
+    cmd.extend(["-stream_loop", "-1", "-i", "{AUDIO}"])
+    
+    if mute_original:
+        cmd.extend(["-map", "0:v:0", "-map", "1:a:0"])
+    else:
+        cmd.extend(["-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[aout]", "-map", "0:v:0", "-map", "[aout]"])
+
+    cmd.extend([
+        "-t", "{DUR}",
+        "-c:v", "copy",
+        "-c:a", "aac", "-b:a", "192k",
+        # MP4 terfragmentasi: muxer menulis streaming tanpa rewrite index (moov) di akhir render
+        "-movflags", "+frag_keyframe+empty_moov+default_base_moof",
+        "{OUT}"
+    ])
+    return cmd
+
+CODEC_ARGS = {(gpu, profile): build_codec_args(gpu, profile) for gpu in (False, True) for profile in NVENC_PROFILES}
+ENCODE_TEMPLATES = {
+    (gpu, mode, mute): build_encode_template(gpu, mode, mute)
+    for gpu in (False, True) for mode in WATERMARK_MODES for mute in (False, True)
+}
+LOOP_TEMPLATES = {mute: build_loop_template(mute) for mute in (False, True)}
+
+def fill_template(template, **values):
+    """Isi placeholder {NAME} di template; nilai berupa list di-splice ke command"""
+    cmd = []
+    for token in template:
+        if token.startswith("{") and token.endswith("}"):
+            value = values[token[1:-1]]
+            if isinstance(value, list):
+                cmd.extend(value)
+            else:
+                cmd.append(str(value))
+        else:
+            cmd.append(token)
+    return cmd
+
+def run_ffmpeg_with_progress(job_id, cmd, total_sec, log_path, label=""):
+    """Jalankan ffmpeg sambil update progress & ETA ke DB dari stream -progress (key=value di stdout).
+    Pipe dibaca per blok (semua yang sudah tersedia), bukan per baris: 1 parse + 1 update per blok.
+    stderr (hanya level error) langsung ditulis ffmpeg ke log_path, tidak lewat Python."""
+    start_time = time.time()
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", "-loglevel", "error", *cmd[1:]]
+    with open(log_path, "ab") as log_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log_file)
+    fd = process.stdout.fileno()
+    
+    reporter = ProgressReporter(job_id)
+    pending = ""
+    finished = False
+    
+    while not finished:
+        chunk = os.read(fd, 65536) # blok sampai ada data, lalu ambil semua yang tersedia
+        if not chunk:
+            break
+        pending += chunk.decode("ascii", "ignore")
+        lines = pending.split("\n")
+        pending = lines.pop() # sisa baris yang belum lengkap
+        
+        # Cukup ambil out_time terakhir di blok ini
+        out_time_us = None
+        for line in lines:
+            key, _, value = line.strip().partition("=")
+            # out_time_ms dari ffmpeg sebenarnya dalam mikrodetik (sama seperti out_time_us)
+            if key == "out_time_us" and value.isdigit():
+                out_time_us = int(value)
+            elif key == "progress" and value == "end":
+                finished = True
+        if out_time_us is None or not total_sec:
+            continue
+        current_sec = out_time_us / 1_000_000
+        
+        # 1. Calculate Progress %
+        progress = min(int((current_sec / total_sec) * 100), 99)
+        
+        # 2. Calculate ETA (hanya jika memang akan ditulis, lihat ProgressReporter)
+        elapsed = time.time() - start_time
+        if current_sec > 0 and reporter.due(progress):
+            speed = current_sec / elapsed # video seconds processed per real second
+            remaining_sec = (total_sec - current_sec) / speed
+            
+            eta_time = datetime.datetime.now() + datetime.timedelta(seconds=remaining_sec)
+            eta_str = eta_time.strftime("%H:%M:%S")
+            eta_msg = f"{label}Selesai jam {eta_str} (Speed: {speed:.1f}x)"
+            
+            reporter.update(progress, eta_msg)
+    
+    process.stdout.close()
+    process.wait()
+    
+    if process.returncode != 0:
+        # Baris error pertama biasanya akar masalahnya (sisanya efek berantai)
+        with open(log_path, "rb") as log_file:
+            first_error = log_file.readline(500).decode("utf-8", "replace").strip()
+        raise Exception(f"FFmpeg returned error code {process.returncode}: {first_error}")
+
+def process_asmr_video(job_id, video_path, audio_path, duration_hours, watermark_mode, mute_original, encode_profile="fast"):
+    """Render 2 tahap: (1) encode source SEKALI (filter watermark + codec), (2) loop hasilnya
+    sampai durasi target dengan -c:v copy. Kerja encoder O(durasi source), bukan O(durasi target)."""
+    loop_source = None
     try:
         if not shutil.which("ffmpeg"):
             raise EnvironmentError("FFmpeg not found!")
 
+        # Tanpa filter video, source H.264 bisa langsung di-loop apa adanya (tahap 1 dilewati)
+        needs_encode = not (watermark_mode == 'none' and probe_video_codec(video_path) == "h264")
         has_gpu = check_nvidia_gpu()
-        if has_gpu:
-            video_codec = "h264_nvenc"
-            preset = "p1"
-            encoding_msg = "🚀 GPU Detected (NVIDIA)."
+        if encode_profile not in NVENC_PROFILES:
+            encode_profile = "fast"
+        if not needs_encode:
+            encoding_msg = "⚡ H.264 source, stream copy (no re-encode)."
+        elif has_gpu:
+            nv_preset, nv_tune = NVENC_PROFILES[encode_profile]
+            encoding_msg = f"🚀 GPU Detected (NVIDIA). Profile: {encode_profile} ({nv_preset}/{nv_tune})."
         else:
-            video_codec = "libx264"
-            preset = "ultrafast"
             encoding_msg = "🐢 No GPU detected (CPU)."
 
         update_job_status(job_id, render_status="rendering", log_msg=f"1. Starting Render... {encoding_msg}")
@@ -242,71 +778,28 @@ def process_asmr_video(job_id, video_path, audio_path, duration_hours, watermark
         target_duration_sec = int(duration_hours * 3600)
         filename = f"asmr_{job_id}_{int(time.time())}.mp4"
         output_full_path = os.path.join(OUTPUT_DIR, filename)
+        log_path = os.path.join(OUTPUT_DIR, f"{filename}.ffmpeg.log")
         
-        # Build Command
-        cmd = ["ffmpeg", "-y"]
-        cmd.extend(["-stream_loop", "-1", "-i", video_path])
-        cmd.extend(["-stream_loop", "-1", "-i", audio_path])
+        # --- STAGE 1: ENCODE SOURCE ONCE ---
+        if needs_encode:
+            loop_source = os.path.join(OUTPUT_DIR, f"src_{filename}")
+            cmd = fill_template(
+                ENCODE_TEMPLATES[(has_gpu, watermark_mode, bool(mute_original))],
+                VIDEO=video_path, CODEC=CODEC_ARGS[(has_gpu, encode_profile)], OUT=loop_source
+            )
+            run_ffmpeg_with_progress(job_id, cmd, probe_duration(video_path), log_path, label="[1/2 Encode] ")
         
-        # Watermark Logic
-        video_filters = []
-        if watermark_mode == 'crop_only':
-            video_filters.append("crop=in_w:in_h-86:0:0")
-        elif watermark_mode == 'blur':
-            video_filters.append("delogo=x=0:y=h-86:w=w:h=86")
-        elif watermark_mode == 'zoom_tl':
-            video_filters.append("crop=in_w-150:in_h-86:0:0,scale=1920:1080:flags=lanczos")
-
-        if video_filters:
-            cmd.extend(["-vf", ",".join(video_filters)])
-            
-        if mute_original:
-            cmd.extend(["-map", "0:v:0", "-map", "1:a:0"])
-        else:
-            cmd.extend(["-filter_complex", "[0:a][1:a]amix=inputs=2:duration=shortest[aout]", "-map", "0:v:0", "-map", "[aout]"])
-
-        cmd.extend([
-            "-t", str(target_duration_sec),
-            "-c:v", video_codec, "-preset", preset,
-            "-c:a", "aac", "-b:a", "192k",
-            output_full_path
-        ])
+        # --- STAGE 2: LOOP TO TARGET DURATION (VIDEO STREAM COPY) ---
+        cmd = fill_template(
+            LOOP_TEMPLATES[bool(mute_original)],
+            VIDEO=loop_source or video_path, AUDIO=audio_path, DUR=target_duration_sec, OUT=output_full_path
+        )
         
         # --- EXECUTE WITH REAL-TIME MONITORING ---
-        start_time = time.time()
-        process = subprocess.Popen(cmd, stderr=subprocess.PIPE, universal_newlines=True)
-        
-        # Regex to catch: time=00:00:05.12
-        time_pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.\d{2}")
-        
-        for line in process.stderr:
-            match = time_pattern.search(line)
-            if match:
-                h, m, s = map(int, match.groups())
-                current_sec = h * 3600 + m * 60 + s
-                
-                # 1. Calculate Progress %
-                progress = min(int((current_sec / target_duration_sec) * 100), 99)
-                
-                # 2. Calculate ETA
-                elapsed = time.time() - start_time
-                if current_sec > 0:
-                    speed = current_sec / elapsed # video seconds processed per real second
-                    remaining_sec = (target_duration_sec - current_sec) / speed
-                    
-                    eta_time = datetime.datetime.now() + datetime.timedelta(seconds=remaining_sec)
-                    eta_str = eta_time.strftime("%H:%M:%S")
-                    eta_msg = f"Selesai jam {eta_str} (Speed: {speed:.1f}x)"
-                    
-                    # Update DB (avoid flooding, strictly simple logic here)
-                    update_job_progress(job_id, progress, eta_msg)
-        
-        process.wait()
-        
-        if process.returncode != 0:
-            raise Exception(f"FFmpeg returned error code {process.returncode}")
+        run_ffmpeg_with_progress(job_id, cmd, target_duration_sec, log_path)
             
-        # Final Success State
+        # Final Success State (log ffmpeg hanya disimpan kalau gagal)
+        os.remove(log_path)
         update_job_progress(job_id, 100, "✅ Render Done")
         update_job_status(
             job_id, 
@@ -319,33 +812,105 @@ def process_asmr_video(job_id, video_path, audio_path, duration_hours, watermark
     except Exception as e:
         update_job_status(job_id, render_status="failed", log_msg=f"Rendering Failed: {str(e)}")
         print(f"Error rendering job {job_id}: {e}")
+    finally:
+        if loop_source and os.path.exists(loop_source):
+            os.remove(loop_source)
+
+RENDER_WORKERS = 1 # satu encoder GPU/CPU sekaligus; job berikutnya antre dengan status 'pending'
+
+@st.cache_resource
+def get_render_pool():
+    """Pool render bersama semua sesi: encode berjalan di subprocess ffmpeg, thread ini hanya membaca progress"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
 
 # ==========================================
 # BACKGROUND SCHEDULER
 # ==========================================
+SCHEDULER_MAX_WAIT = 300 # detik; batas atas tidur walau tidak ada jadwal (jaga-jaga perubahan jam sistem)
+
+@st.cache_resource
+def get_scheduler_cv():
+    """Condition variable bersama: scheduler tidur di sini sampai jadwal terdekat atau ada job baru"""
+    return threading.Condition()
+
+def notify_scheduler():
+    cv = get_scheduler_cv()
+    with cv:
+        cv.notify()
+
+UPLOAD_WORKERS = 4 # upload ke YouTube dibatasi jaringan, bukan CPU -> aman paralel
+
+@st.cache_resource
+def get_upload_pool():
+    """Thread pool upload + set ID job yang sedang diupload (agar tidak di-dispatch dua kali)"""
+    return {
+        "pool": concurrent.futures.ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload"),
+        "inflight": set(),
+        "lock": threading.Lock(),
+    }
+
+def release_upload(uploads, job_id):
+    with uploads["lock"]:
+        uploads["inflight"].discard(job_id)
+
+def do_upload(job):
+    try:
+        # Call upload with job_id for progress tracking
+        vid_id = upload_video_to_youtube(
+            job['id'],
+            job['output_path'], job['title'], job['description'], job['tags']
+        )
+        update_job_status(job['id'], upload_status="success", youtube_id=vid_id, log_msg=f"4. Upload Success! ID: {vid_id}")
+    except Exception as e:
+        update_job_status(job['id'], upload_status="failed", log_msg=f"Upload Failed: {str(e)}")
+
 def scheduler_loop():
+    cv = get_scheduler_cv()
+    uploads = get_upload_pool()
+    backoff = 1
     while True:
         try:
             jobs = get_ready_to_upload_jobs()
+            retry_soon = False
             for job in jobs:
-                scheduled_time = datetime.datetime.fromisoformat(job['scheduled_at'])
-                current_time = datetime.datetime.now()
-                
-                if current_time >= scheduled_time:
+                with uploads["lock"]:
+                    if job['id'] in uploads["inflight"]:
+                        retry_soon = True
+                        continue
+                    uploads["inflight"].add(job['id'])
+                # Status 'uploading' di-commit dulu supaya job tidak terbaca 'waiting' lagi di iterasi berikutnya
+                try:
                     update_job_status(job['id'], upload_status="uploading", log_msg="3. Schedule Reached. Uploading...")
-                    try:
-                        # Call upload with job_id for progress tracking
-                        vid_id = upload_video_to_youtube(
-                            job['id'],
-                            job['output_path'], job['title'], job['description'], job['tags']
-                        )
-                        update_job_status(job['id'], upload_status="success", youtube_id=vid_id, log_msg=f"4. Upload Success! ID: {vid_id}")
-                    except Exception as e:
-                        update_job_status(job['id'], upload_status="failed", log_msg=f"Upload Failed: {str(e)}")
-            time.sleep(20)
+                except Exception as e:
+                    # Transisi tidak ter-commit -> job masih 'waiting_schedule', dicoba lagi iterasi berikutnya
+                    release_upload(uploads, job['id'])
+                    print(f"Scheduler Error (job {job['id']}): {e}")
+                    retry_soon = True
+                    continue
+                try:
+                    future = uploads["pool"].submit(do_upload, job)
+                except Exception as e:
+                    release_upload(uploads, job['id'])
+                    update_job_status(job['id'], upload_status="waiting_schedule", log_msg=f"Upload dispatch failed, re-queued: {e}")
+                    raise
+                future.add_done_callback(lambda f, jid=job['id']: release_upload(uploads, jid))
+            
+            # Query jadwal terdekat di dalam lock cv agar notify yang datang sesudahnya tidak terlewat
+            with cv:
+                next_at = get_next_scheduled_at()
+                if next_at is None:
+                    delay = SCHEDULER_MAX_WAIT
+                else:
+                    delay = min(max(next_at - time.time(), 0), SCHEDULER_MAX_WAIT)
+                if retry_soon:
+                    delay = max(delay, 1) # job masih tercatat 'waiting' (in-flight / gagal di-dispatch), jangan busy-loop
+                if delay > 0:
+                    cv.wait(timeout=delay)
+            backoff = 1
         except Exception as e:
             print(f"Scheduler Error: {e}")
-            time.sleep(20)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
 
 @st.cache_resource
 def start_scheduler():
@@ -359,6 +924,12 @@ start_scheduler()
 # ==========================================
 # UI
 # ==========================================
+PROGRESS_REFRESH_SEC = 2 # interval auto-refresh fragment panel progress
+
+def job_is_active(job):
+    """Job yang masih bergerak (antre/render/menunggu jadwal/upload) -> panel progress perlu auto-refresh"""
+    return job['status_render'] in ('pending', 'rendering') or job['status_upload'] in ('waiting_schedule', 'uploading')
+
 def ui_upload_tab():
     st.header("1. Create, Render & Schedule")
     has_gpu = check_nvidia_gpu()
@@ -389,19 +960,19 @@ def ui_upload_tab():
         
         watermark_mode = st.selectbox(
             "Watermark Removal Mode", 
-            ["none", "zoom_tl", "crop_only", "blur"],
-            format_func=lambda x: {
-                "none": "⛔ None (Original)",
-                "zoom_tl": "✨ Zoom Top-Left (Recommended)",
-                "crop_only": "✂️ Crop Bottom Only",
-                "blur": "💧 Blur Bottom"
-            }[x],
+            WATERMARK_MODES,
+            format_func=WM_LABELS.__getitem__,
             index=1
         )
         if watermark_mode == "zoom_tl":
             st.caption("ℹ️ *Crop bottom-right, then resize to 1080p.*")
 
         remove_audio = st.toggle("🔇 Mute Original Video Audio", value=True)
+        encode_profile = st.radio(
+            "GPU Encode Profile", list(NVENC_PROFILES.keys()),
+            horizontal=True, disabled=not has_gpu,
+            help="fast = p1/ull, balanced = p4/ll, quality = p7/hq (NVENC only)"
+        )
         st.markdown("---")
         duration = st.number_input("Duration (Hours)", 0.1, 24.0, 1.0, 0.1)
 
@@ -419,38 +990,98 @@ def ui_upload_tab():
 
     if st.button("🚀 Render Now (Upload Later)", type="primary"):
         if uploaded_video and uploaded_audio:
-            v_path = os.path.join(UPLOAD_DIR, uploaded_video.name)
-            a_path = os.path.join(UPLOAD_DIR, uploaded_audio.name)
-            with open(v_path, "wb") as f: f.write(uploaded_video.getbuffer())
-            with open(a_path, "wb") as f: f.write(uploaded_audio.getbuffer())
+            v_path = save_upload(uploaded_video)
+            a_path = save_upload(uploaded_audio)
             
             s_dt = datetime.datetime.combine(s_date, s_time)
             
             job_id = add_job(v_path, a_path, 0, duration, title, desc, tags, s_dt, watermark_mode, remove_audio)
             
-            # Run processing in thread
-            t = threading.Thread(target=process_asmr_video, args=(job_id, v_path, a_path, duration, watermark_mode, remove_audio))
-            t.start()
+            # Antrikan ke render pool (bukan thread baru per klik); job mulai setelah render sebelumnya selesai
+            update_job_status(job_id, log_msg="0. Queued for render.")
+            get_render_pool().submit(process_asmr_video, job_id, v_path, a_path, duration, watermark_mode, remove_audio, encode_profile)
             
-            st.success(f"Job #{job_id} Started! Go to 'Manage' tab to see progress.")
+            st.success(f"Job #{job_id} Queued! Render dimulai setelah render sebelumnya selesai. Lihat progress di tab 'Manage'.")
         else:
             st.error("Please upload files first.")
 
+def render_progress_panel(job):
+    """Panel dual progress bar (render & upload) + ETA untuk satu job"""
+    # === LOGIKA DUAL PROGRESS BAR ===
+    
+    # 1. Bersihkan nilai Raw dari Database (Agar tidak error)
+    raw_db_progress = job['progress']
+    try:
+        db_progress = int(raw_db_progress)
+    except (ValueError, TypeError):
+        db_progress = 0
+    
+    # Clamping 0-100
+    db_progress = max(0, min(100, db_progress))
+
+    # 2. Tentukan Nilai Render Bar
+    render_val = 0
+    if job['status_render'] == 'success':
+        render_val = 100
+    elif job['status_render'] == 'rendering':
+        render_val = db_progress
+    
+    # 3. Tentukan Nilai Upload Bar
+    upload_val = 0
+    if job['status_upload'] == 'success':
+        upload_val = 100
+    elif job['status_upload'] == 'uploading':
+        upload_val = db_progress
+    elif job['status_upload'] == 'waiting_schedule':
+        upload_val = 0 # Masih menunggu
+
+    # === TAMPILKAN DI UI ===
+    st.markdown("#### 📊 Processing Steps")
+    
+    col_render, col_upload = st.columns(2)
+    
+    with col_render:
+        st.write("**1. Rendering**")
+        st.progress(render_val)
+        if render_val == 100: st.success("✅ Render Complete")
+        elif job['status_render'] == 'rendering': st.info(f"⚙️ Rendering... {render_val}%")
+        elif job['status_render'] == 'failed': st.error("❌ Render Failed")
+        elif job['status_render'] == 'pending': st.caption("⏳ Queued (menunggu render lain selesai)...")
+        else: st.caption("Waiting...")
+
+    with col_upload:
+        st.write("**2. Uploading**")
+        st.progress(upload_val)
+        if upload_val == 100: st.success("✅ Upload Complete")
+        elif job['status_upload'] == 'uploading': st.info(f"☁️ Uploading... {upload_val}%")
+        elif job['status_upload'] == 'waiting_schedule': st.warning("⏳ Waiting Schedule")
+        else: st.caption("Waiting...")
+
+    # Info ETA (Hanya muncul jika sedang render)
+    if job['status_render'] == 'rendering':
+         st.caption(f"⏱️ **Estimasi Selesai Render:** {job['eta_text']}")
+
+@st.fragment(run_every=PROGRESS_REFRESH_SEC)
+def live_progress_panel(job_id, drawn_render, drawn_upload):
+    """Hanya fragment ini yang dieksekusi ulang tiap tick; sisa tab (video, log, metadata) tidak ikut rerun.
+    Begitu status berbeda dari saat halaman digambar, seluruh app di-rerun agar tabel, output & log ikut segar."""
+    job = get_job_progress(job_id)
+    if not job:
+        return
+    if (job['status_render'], job['status_upload']) != (drawn_render, drawn_upload):
+        get_jobs_summary_df.clear()
+        get_job_detail.clear()
+        st.rerun()
+    render_progress_panel(job)
+
 def ui_manager_tab():
     st.header("Status Manager")
-    
-    col_btn, col_info = st.columns([1, 4])
-    with col_btn:
-        if st.button("🔄 Refresh Status", use_container_width=True):
-            st.rerun()
-    with col_info:
-        st.caption("Klik refresh untuk memperbarui progress bar secara manual.")
-
-    df = get_jobs_df()
+
+    df = get_jobs_summary_df()
     if not df.empty:
         # Tampilkan tabel utama
         st.dataframe(
-            df[['id', 'title', 'status_render', 'status_upload', 'scheduled_at']], 
+            df, 
             use_container_width=True, 
             hide_index=True
         )
@@ -459,71 +1090,24 @@ def ui_manager_tab():
         st.subheader("🔎 Job Monitor & Details")
         sel_id = st.selectbox("Select Job ID to view:", df['id'].tolist())
         
-        if sel_id:
-            job = df[df['id'] == sel_id].iloc[0]
-            
-            # === LOGIKA DUAL PROGRESS BAR ===
-            
-            # 1. Bersihkan nilai Raw dari Database (Agar tidak error)
-            raw_db_progress = job['progress']
-            try:
-                db_progress = int(raw_db_progress)
-            except (ValueError, TypeError):
-                db_progress = 0
-            
-            # Clamping 0-100
-            db_progress = max(0, min(100, db_progress))
-
-            # 2. Tentukan Nilai Render Bar
-            render_val = 0
-            if job['status_render'] == 'success':
-                render_val = 100
-            elif job['status_render'] == 'rendering':
-                render_val = db_progress
-            
-            # 3. Tentukan Nilai Upload Bar
-            upload_val = 0
-            if job['status_upload'] == 'success':
-                upload_val = 100
-            elif job['status_upload'] == 'uploading':
-                upload_val = db_progress
-            elif job['status_upload'] == 'waiting_schedule':
-                upload_val = 0 # Masih menunggu
-
-            # === TAMPILKAN DI UI ===
-            st.markdown("#### 📊 Processing Steps")
-            
-            col_render, col_upload = st.columns(2)
-            
-            with col_render:
-                st.write("**1. Rendering**")
-                st.progress(render_val)
-                if render_val == 100: st.success("✅ Render Complete")
-                elif job['status_render'] == 'rendering': st.info(f"⚙️ Rendering... {render_val}%")
-                elif job['status_render'] == 'failed': st.error("❌ Render Failed")
-                else: st.caption("Waiting...")
-
-            with col_upload:
-                st.write("**2. Uploading**")
-                st.progress(upload_val)
-                if upload_val == 100: st.success("✅ Upload Complete")
-                elif job['status_upload'] == 'uploading': st.info(f"☁️ Uploading... {upload_val}%")
-                elif job['status_upload'] == 'waiting_schedule': st.warning("⏳ Waiting Schedule")
-                else: st.caption("Waiting...")
-
-            # Info ETA (Hanya muncul jika sedang render)
-            if job['status_render'] == 'rendering':
-                 st.caption(f"⏱️ **Estimasi Selesai Render:** {job['eta_text']}")
+        job = get_job_detail(sel_id) if sel_id else None
+        if job:
+            # Panel progress live (fragment auto-refresh) hanya selama job aktif; selain itu gambar statis
+            if job_is_active(job):
+                live_progress_panel(sel_id, job['status_render'], job['status_upload'])
+            else:
+                render_progress_panel(job)
 
             st.divider()
 
             c1, c2, c3 = st.columns([1, 1, 1])
             with c1:
                 st.write("**File Info**")
-                if os.path.exists(job['video_path']):
+                if stat_file(job['video_path']) is not None:
                     if st.button("📂 Source Video", key=f"v_{sel_id}"): open_local_folder(job['video_path'])
                 
-                if job['output_path'] and os.path.exists(job['output_path']):
+                output_stat = stat_file(job['output_path']) if job['output_path'] else None
+                if output_stat is not None:
                     st.success("Output Available")
                     st.video(job['output_path'])
                     
@@ -534,14 +1118,17 @@ def ui_manager_tab():
                     # --- FEATURE 3: DOWNLOAD BUTTON ---
                     with col_down:
                         try:
-                            with open(job['output_path'], "rb") as file:
+                            if output_stat.st_size <= DOWNLOAD_EMBED_MAX:
+                                # Data berupa callable: file baru dibaca saat tombol diklik, bukan tiap rerun
                                 btn = st.download_button(
                                     label="⬇️ Download Video",
-                                    data=file,
+                                    data=functools.partial(read_file_bytes, job['output_path']),
                                     file_name=os.path.basename(job['output_path']),
                                     mime="video/mp4",
                                     key=f"dl_{sel_id}"
                                 )
+                            else:
+                                st.caption("File terlalu besar untuk diunduh via browser, pakai 📂 Open Folder.")
                         except Exception as e:
                             st.error("File not ready.")
 
@@ -552,7 +1139,7 @@ def ui_manager_tab():
                 
             with c3:
                 st.write("**System Logs**")
-                st.text_area("Logs", value=job['logs'], height=300, key=f"l_{sel_id}", disabled=True)
+                st.text_area("Logs", value=get_job_logs(sel_id), height=300, key=f"l_{sel_id}", disabled=True)
     else:
         st.info("No jobs found.")
 